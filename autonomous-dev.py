@@ -2,37 +2,99 @@
 """
 Autonomous Development Agent for FireLater
 Uses Ollama Cloud (qwen3-coder:480b) directly via REST API
+
+Dependencies: pip install httpx orjson
+Optional: pip install 'httpx[http2]' to multiplex concurrent requests
+over one connection (plain HTTP/1.1 is used when h2 is not installed)
 """
 
 import os
+import re
 import sys
-import json
+import gzip
 import time
-import subprocess
-import urllib.request
-from datetime import datetime
+import hashlib
+import atexit
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+import httpx
+import orjson
+
+try:
+    import h2  # noqa: F401  # httpx's http2 extra
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 PROJECT_DIR = Path("/Users/lokesh/git/firelater")
 TODO_FILE = PROJECT_DIR / "AUTONOMOUS_TODO.md"
 LOG_FILE = PROJECT_DIR / ".autonomous-dev.log"
 OLLAMA_URL = "http://localhost:11434/api/chat"
 MODEL = "qwen3-coder:480b-cloud"
+BATCH = 4  # Tasks executed concurrently per iteration
+LLM_RETRIES = 2
+LLM_RETRY_BACKOFF = 0.5  # seconds, doubled per retry
+ECHO_LIMIT = 2000  # Chars of each streamed response to echo to the console
+KEEP_ALIVE = "60m"  # How long Ollama keeps the model loaded after a request
+PING_INTERVAL = 240  # Seconds between keep-alive pings during idle periods
+
+# Shared HTTP client, created once inside the event loop in main_async();
+# HTTP/2 lets concurrent requests multiplex over a single connection
+CLIENT: httpx.AsyncClient | None = None
+
+# Serializes TODO file read-modify-write across concurrent tasks
+TODO_LOCK = asyncio.Lock()
+
+# Buffered log handle, opened on first use; flushed every few lines and at exit
+LOG_FH = None
+LOG_FLUSH_EVERY = 20
+_log_pending = 0
 
 def log(msg: str):
-    timestamp = datetime.now().strftime("%H:%M:%S")
+    global LOG_FH, _log_pending
+    timestamp = time.strftime("%H:%M:%S")
     line = f"[{timestamp}] {msg}"
     print(line)
-    with open(LOG_FILE, "a") as f:
-        f.write(line + "\n")
+    if LOG_FH is None:
+        LOG_FH = open(LOG_FILE, "a", buffering=65536)
+        atexit.register(LOG_FH.close)
+    LOG_FH.write(line + "\n")
+    _log_pending += 1
+    if _log_pending >= LOG_FLUSH_EVERY:
+        LOG_FH.flush()
+        _log_pending = 0
+
+def flush_log():
+    global _log_pending
+    if LOG_FH is not None:
+        LOG_FH.flush()
+        _log_pending = 0
+
+@lru_cache(maxsize=256)
+def _read_cached(path: str, mtime_ns: int) -> str:
+    # mtime_ns is part of the key so a rewritten file misses the cache
+    return Path(path).read_text()
 
 def read_file(path: str) -> str:
     try:
         full_path = PROJECT_DIR / path if not path.startswith("/") else Path(path)
-        return full_path.read_text()
+        return _read_cached(str(full_path), full_path.stat().st_mtime_ns)
     except Exception as e:
         return f"Error reading {path}: {e}"
 
+READ_POOL = ThreadPoolExecutor(max_workers=8)
+
+async def read_files(paths: list) -> dict:
+    """Read several files concurrently without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    contents = await asyncio.gather(
+        *(loop.run_in_executor(READ_POOL, read_file, p) for p in paths)
+    )
+    return dict(zip(paths, contents))
+
 def write_file(path: str, content: str):
     full_path = PROJECT_DIR / path if not path.startswith("/") else Path(path)
     full_path.parent.mkdir(parents=True, exist_ok=True)
@@ -40,37 +102,239 @@ def write_file(path: str, content: str):
     log(f"Wrote: {path}")
 
 def git_commit(message: str):
+    import subprocess  # deferred: only needed once per commit batch
     try:
         subprocess.run(["git", "add", "-A"], cwd=PROJECT_DIR, capture_output=True)
         result = subprocess.run(["git", "commit", "-m", message], cwd=PROJECT_DIR, capture_output=True)
         if result.returncode == 0:
-            log(f"Committed: {message}")
+            log(f"Committed: {message.splitlines()[0]}")
         else:
             log("No changes to commit")
     except Exception as e:
         log(f"Commit error: {e}")
 
-def call_llm(messages: list) -> str:
-    """Call Ollama API with the given messages"""
-    payload = json.dumps({
+# Completed-task messages waiting to be committed in one batched git run
+PENDING_COMMITS = []
+COMMIT_EVERY = 5
+
+def queue_commit(message: str):
+    PENDING_COMMITS.append(message)
+
+def flush_commits():
+    """Commit all queued task messages with a single git add/commit pair"""
+    if not PENDING_COMMITS:
+        return
+    messages = PENDING_COMMITS[:]
+    PENDING_COMMITS.clear()
+    if len(messages) == 1:
+        git_commit(messages[0])
+    else:
+        body = "\n".join(f"- {m}" for m in messages)
+        git_commit(f"Auto batch: {len(messages)} tasks\n\n{body}")
+
+async def call_llm(messages: list, echo: bool = True) -> str:
+    """Call Ollama API with the given messages, streaming tokens as they arrive"""
+    payload = {
         "model": MODEL,
         "messages": messages,
-        "stream": False
-    }).encode('utf-8')
+        "stream": True,
+        "keep_alive": KEEP_ALIVE
+    }
+    # Compress the (often 20+ KB) prompt before it crosses the socket;
+    # level 1 because speed matters more than ratio on loopback
+    body = gzip.compress(orjson.dumps(payload), compresslevel=1)
+    headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+
+    last_error = None
+    for attempt in range(LLM_RETRIES + 1):
+        if attempt > 0:
+            await asyncio.sleep(LLM_RETRY_BACKOFF * (2 ** (attempt - 1)))
+        try:
+            parts = []
+            echoed = 0
+            async with CLIENT.stream("POST", OLLAMA_URL, content=body, headers=headers) as resp:
+                # Surface non-2xx replies (missing model, bad request) as
+                # errors instead of streaming an empty token sequence
+                resp.raise_for_status()
+                # Ollama streams NDJSON: one JSON object per line
+                async for raw in resp.aiter_lines():
+                    raw = raw.strip()
+                    if not raw:
+                        continue
+                    chunk = orjson.loads(raw)
+                    token = chunk.get('message', {}).get('content', '')
+                    if token:
+                        parts.append(token)
+                        # Echo the first part of the response as it generates
+                        if echo and echoed < ECHO_LIMIT:
+                            print(token[:ECHO_LIMIT - echoed], end='', flush=True)
+                            echoed += len(token)
+                    if chunk.get('done'):
+                        break
+            return ''.join(parts)
+        except Exception as e:
+            last_error = e
+            log(f"LLM Error (attempt {attempt + 1}/{LLM_RETRIES + 1}): {e}")
+
+    return f"ERROR: {last_error}"
+
+# Cached LLM responses keyed by task text + relevant-file signatures, so
+# re-running a task over unchanged files skips the round-trip entirely
+CACHE_DIR = PROJECT_DIR / ".autonomous-cache"
+RESPONSE_CACHE_FILE = CACHE_DIR / "responses.json"
+RESPONSE_CACHE_MAX = 256
+_response_cache = None
 
+def _load_response_cache() -> dict:
+    global _response_cache
+    if _response_cache is None:
+        try:
+            _response_cache = orjson.loads(RESPONSE_CACHE_FILE.read_bytes())
+        except (OSError, ValueError):
+            _response_cache = {}
+    return _response_cache
+
+def _save_response_cache():
     try:
-        req = urllib.request.Request(
-            OLLAMA_URL,
-            data=payload,
-            headers={'Content-Type': 'application/json'}
-        )
-        with urllib.request.urlopen(req, timeout=600) as resp:
-            result = json.loads(resp.read().decode('utf-8'))
-            content = result.get('message', {}).get('content', '')
-            return content
+        CACHE_DIR.mkdir(exist_ok=True)
+        RESPONSE_CACHE_FILE.write_bytes(orjson.dumps(_response_cache))
+    except OSError as e:
+        log(f"Could not persist response cache: {e}")
+
+def response_cache_key(task_text: str, relevant_files: list) -> str:
+    # blake2b: noticeably faster than SHA-2 for these tiny inputs
+    h = hashlib.blake2b(task_text.encode())
+    for p in sorted(relevant_files):
+        try:
+            mtime = os.stat(PROJECT_DIR / p).st_mtime_ns
+        except OSError:
+            mtime = -1
+        h.update(f"|{p}:{mtime}".encode())
+    return h.hexdigest()
+
+async def call_llm_cached(cache_key: str, messages: list, echo: bool = True) -> str:
+    cache = _load_response_cache()
+    cached = cache.get(cache_key)
+    if cached is not None:
+        log("Response cache hit, skipping LLM call")
+        return cached
+    response = await call_llm(messages, echo=echo)
+    if response and not response.startswith("ERROR:"):
+        cache[cache_key] = response
+        while len(cache) > RESPONSE_CACHE_MAX:
+            cache.pop(next(iter(cache)))
+        _save_response_cache()
+    return response
+
+async def keepalive_pinger():
+    """Ping Ollama every few minutes so the model never unloads between
+    iterations - a reload of the 480B model costs far more than any ping"""
+    ping = {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": "."}],
+        "stream": False,
+        "keep_alive": KEEP_ALIVE,
+        "options": {"num_predict": 1}
+    }
+    while True:
+        await asyncio.sleep(PING_INTERVAL)
+        try:
+            await CLIENT.post(OLLAMA_URL, json=ping)
+        except Exception:
+            pass  # Ollama down or busy; the next real call will report it
+
+async def prewarm_session():
+    """Open the connection to Ollama up front so the first LLM call reuses it"""
+    base_url = OLLAMA_URL.replace('/api/chat', '')
+    try:
+        resp = await CLIENT.head(base_url)
+        log(f"Pre-warmed connection to Ollama ({resp.status_code})")
     except Exception as e:
-        log(f"LLM Error: {e}")
-        return f"ERROR: {e}"
+        log(f"Pre-warm failed (Ollama may be down): {e}")
+
+class TodoStore:
+    """In-memory view of the TODO file, flushed atomically once per iteration"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lines = []
+        self.dirty = False
+        self._session_log_idx = None
+        self._pending = set()
+        self._completed = set()
+
+    def load(self):
+        self.lines = self.path.read_text().split("\n")
+        self.dirty = False
+        self._session_log_idx = self._find_section("## Session Log")
+        self._pending = set()
+        self._completed = set()
+        for line in self.lines:
+            stripped = line.strip()
+            if stripped.startswith("- [ ]"):
+                self._pending.add(stripped[6:].strip())
+            elif stripped.startswith("- [x]"):
+                self._completed.add(stripped[6:].strip())
+
+    def _find_section(self, heading: str):
+        for i, line in enumerate(self.lines):
+            if line.strip() == heading:
+                return i
+        return None
+
+    def flush(self):
+        if not self.dirty:
+            return
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text("\n".join(self.lines))
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def get_next_tasks(self, limit: int = 1) -> list:
+        """Return up to `limit` distinct pending tasks"""
+        tasks = []
+        for line in self.lines:
+            if line.strip().startswith("- [ ]"):
+                tasks.append(line.strip()[6:].strip())
+                if len(tasks) >= limit:
+                    break
+        return tasks
+
+    def mark_task_complete(self, task: str):
+        if task not in self._pending:
+            return
+        target = f"- [ ] {task}"
+        for i, line in enumerate(self.lines):
+            if line.strip() == target:
+                self.lines[i] = line.replace("- [ ]", "- [x]", 1)
+                self._pending.discard(task)
+                self._completed.add(task)
+                self.dirty = True
+                break
+
+    def add_session_note(self, note: str):
+        if self._session_log_idx is None:
+            return
+        timestamp = time.strftime("%Y-%m-%d %H:%M")
+        self.lines.insert(self._session_log_idx + 1, f"- [{timestamp}] {note}")
+        self.dirty = True
+
+    def add_task(self, task_line: str) -> bool:
+        """Queue a new task line unless it is already pending"""
+        task = task_line.strip()[6:].strip()
+        if task in self._pending or task in self._completed:
+            return False
+        for i, line in enumerate(self.lines):
+            if line.strip() == "## Priority Queue":
+                self.lines.insert(i + 1, task_line)
+                if self._session_log_idx is not None and i < self._session_log_idx:
+                    self._session_log_idx += 1
+                self._pending.add(task)
+                self.dirty = True
+                return True
+        return False
+
+TODO_STORE = TodoStore(TODO_FILE)
 
 def init_todo():
     if not TODO_FILE.exists():
@@ -94,108 +358,168 @@ def init_todo():
 
 """)
         log("Initialized TODO file")
+    TODO_STORE.load()
 
-def get_next_task() -> str:
-    content = TODO_FILE.read_text()
-    for line in content.split("\n"):
-        if line.strip().startswith("- [ ]"):
-            return line.strip()[6:].strip()
-    return ""
-
-def mark_task_complete(task: str):
-    content = TODO_FILE.read_text()
-    content = content.replace(f"- [ ] {task}", f"- [x] {task}")
-    TODO_FILE.write_text(content)
-
-def add_session_note(note: str):
-    content = TODO_FILE.read_text()
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-    note_line = f"- [{timestamp}] {note}\n"
-
-    if "## Session Log" in content:
-        parts = content.split("## Session Log")
-        content = parts[0] + "## Session Log\n" + note_line + parts[1].lstrip("\n")
-
-    TODO_FILE.write_text(content)
+def _dir_mtime(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return -1
+
+_SCAN_CACHE = {}  # dir path -> (mtime_ns, {name: DirEntry})
+
+def scan_dir(dir_path: Path) -> dict:
+    """Directory listing as a {name: DirEntry} map, cached on the dir mtime.
+
+    Lets callers answer many existence probes from one scandir pass instead
+    of a stat syscall per candidate file.
+    """
+    key = str(dir_path)
+    mtime = _dir_mtime(dir_path)
+    cached = _SCAN_CACHE.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    entries = {}
+    if mtime != -1:
+        try:
+            entries = {e.name: e for e in os.scandir(dir_path)}
+        except OSError:
+            entries = {}
+    _SCAN_CACHE[key] = (mtime, entries)
+    return entries
+
+class FileIndex:
+    """Cached index of interesting project files, rebuilt per root when its
+    directory mtime advances instead of re-globbing every iteration"""
+
+    def __init__(self, project_dir: Path):
+        self.project_dir = project_dir
+        self._roots = {
+            "routes": project_dir / "backend" / "src" / "routes",
+            "services": project_dir / "backend" / "src" / "services",
+            "schemas": project_dir / "backend" / "src" / "schemas",
+            "tests": project_dir / "backend" / "src" / "tests",
+            "pages": project_dir / "frontend" / "src" / "app",
+        }
+        self._files = {name: [] for name in self._roots}
+        self._mtimes = {name: None for name in self._roots}
+
+    def _walk(self, name: str) -> list:
+        root = self._roots[name]
+        found = []
+        if name == "pages":
+            # Recursive scan for Next.js page components
+            stack = [str(root)]
+            while stack:
+                try:
+                    entries = list(os.scandir(stack.pop()))
+                except OSError:
+                    continue
+                for e in entries:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+                    elif e.name == "page.tsx":
+                        found.append(str(Path(e.path).relative_to(self.project_dir)))
+        else:
+            try:
+                entries = list(os.scandir(root))
+            except OSError:
+                return found
+            for e in entries:
+                if e.name.endswith(".ts") and e.is_file(follow_symlinks=False):
+                    found.append(str(Path(e.path).relative_to(self.project_dir)))
+        found.sort()
+        return found
+
+    def get(self, name: str) -> list:
+        mtime = _dir_mtime(self._roots[name])
+        if mtime != self._mtimes[name]:
+            self._files[name] = self._walk(name)
+            self._mtimes[name] = mtime
+        return self._files[name]
+
+    def mark_stale(self):
+        """Force a re-walk on next access (used after the agent creates files)"""
+        self._mtimes = {name: None for name in self._roots}
+
+FILE_INDEX = FileIndex(PROJECT_DIR)
 
 def get_file_list() -> list:
     """Get list of important project files"""
-    files = []
-
-    # Backend routes
-    routes_dir = PROJECT_DIR / "backend" / "src" / "routes"
-    if routes_dir.exists():
-        files.extend([str(f.relative_to(PROJECT_DIR)) for f in routes_dir.glob("*.ts")][:10])
-
-    # Backend services
-    services_dir = PROJECT_DIR / "backend" / "src" / "services"
-    if services_dir.exists():
-        files.extend([str(f.relative_to(PROJECT_DIR)) for f in services_dir.glob("*.ts")][:10])
-
-    # Frontend pages
-    pages_dir = PROJECT_DIR / "frontend" / "src" / "app"
-    if pages_dir.exists():
-        files.extend([str(f.relative_to(PROJECT_DIR)) for f in pages_dir.rglob("page.tsx")][:10])
-
-    return files
-
-def execute_task(task: str):
-    """Execute a single task using the LLM"""
-    log(f"Executing: {task}")
-
-    # Read project context
-    readme = read_file("README.md")[:3000]
-
-    # Determine relevant files based on task keywords
+    return (
+        FILE_INDEX.get("routes")[:10]
+        + FILE_INDEX.get("services")[:10]
+        + FILE_INDEX.get("pages")[:10]
+    )
+
+def select_relevant_files(task: str) -> list:
+    """Pick project files relevant to a task based on its keywords"""
     relevant_files = []
     task_lower = task.lower()
 
     if "auth" in task_lower:
         for f in ["backend/src/routes/auth.ts", "backend/src/middleware/auth.ts", "backend/src/services/auth.service.ts"]:
-            if (PROJECT_DIR / f).exists():
+            rel = Path(f)
+            if rel.name in scan_dir(PROJECT_DIR / rel.parent):
                 relevant_files.append(f)
 
     if "sql" in task_lower or "database" in task_lower or "query" in task_lower:
-        services_dir = PROJECT_DIR / "backend" / "src" / "services"
-        if services_dir.exists():
-            relevant_files.extend([str(f.relative_to(PROJECT_DIR)) for f in services_dir.glob("*.ts")][:5])
+        relevant_files.extend(FILE_INDEX.get("services")[:5])
 
     if "api" in task_lower or "endpoint" in task_lower or "error" in task_lower:
-        routes_dir = PROJECT_DIR / "backend" / "src" / "routes"
-        if routes_dir.exists():
-            relevant_files.extend([str(f.relative_to(PROJECT_DIR)) for f in routes_dir.glob("*.ts")][:5])
+        relevant_files.extend(FILE_INDEX.get("routes")[:5])
 
     if "validation" in task_lower or "input" in task_lower:
-        for d in ["backend/src/routes", "backend/src/schemas"]:
-            dir_path = PROJECT_DIR / d
-            if dir_path.exists():
-                relevant_files.extend([str(f.relative_to(PROJECT_DIR)) for f in dir_path.glob("*.ts")][:3])
+        relevant_files.extend(FILE_INDEX.get("routes")[:3])
+        relevant_files.extend(FILE_INDEX.get("schemas")[:3])
 
     if "test" in task_lower:
-        test_dir = PROJECT_DIR / "backend" / "src" / "tests"
-        if test_dir.exists():
-            relevant_files.extend([str(f.relative_to(PROJECT_DIR)) for f in test_dir.glob("*.ts")][:5])
+        relevant_files.extend(FILE_INDEX.get("tests")[:5])
 
     if "frontend" in task_lower or "ui" in task_lower or "ux" in task_lower:
-        pages_dir = PROJECT_DIR / "frontend" / "src" / "app"
-        if pages_dir.exists():
-            relevant_files.extend([str(f.relative_to(PROJECT_DIR)) for f in pages_dir.rglob("page.tsx")][:5])
+        relevant_files.extend(FILE_INDEX.get("pages")[:5])
 
     # Default: grab some key files
     if not relevant_files:
         relevant_files = get_file_list()[:5]
 
-    # Read file contents
-    file_context = ""
-    for f in relevant_files[:5]:  # Limit to 5 files
-        content = read_file(f)
-        if not content.startswith("Error"):
-            file_context += f"\n\n=== {f} ===\n{content[:5000]}"
+    return relevant_files
 
-    messages = [
-        {
-            "role": "system",
-            "content": """You are a senior software engineer working on FireLater, an ITSM SaaS platform.
+CONTEXT_TOKEN_BUDGET = 6000
+CHARS_PER_TOKEN = 4  # cheap proxy: source code averages ~4 chars per BPE token
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _file_mtime(path: str) -> int:
+    return _dir_mtime(PROJECT_DIR / path)
+
+async def build_file_context(relevant_files: list, limit: int = 5,
+                             budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Read the given files in parallel and pack them into a token budget,
+    most recently changed files first"""
+    files = sorted(relevant_files[:limit], key=_file_mtime, reverse=True)
+    contents = await read_files(files)
+    parts = []
+    remaining = budget
+    for f in files:
+        content = contents[f]
+        if content.startswith("Error"):
+            continue
+        header = f"\n\n=== {f} ===\n"
+        avail = remaining * CHARS_PER_TOKEN - len(header)
+        if avail <= 0:
+            break
+        if len(content) > avail:
+            # Truncate on a line boundary rather than mid-statement
+            cut = content.rfind("\n", 0, avail)
+            content = content[:cut if cut > 0 else avail]
+        parts.append(header)
+        parts.append(content)
+        remaining -= estimate_tokens(header) + estimate_tokens(content)
+    return "".join(parts)
+
+SYSTEM_PROMPT = """You are a senior software engineer working on FireLater, an ITSM SaaS platform.
 
 Analyze code and provide specific, actionable fixes.
 
@@ -215,68 +539,257 @@ RULES:
 - No emojis
 - TypeScript strict mode
 - Only show changed code sections, not entire files"""
-        },
-        {
-            "role": "user",
-            "content": f"""TASK: {task}
 
-PROJECT: FireLater - ITSM SaaS Platform
+PROJECT_BLURB = """PROJECT: FireLater - ITSM SaaS Platform
 - Backend: Node.js + Fastify + PostgreSQL
 - Frontend: Next.js 15 + Tailwind CSS
-- Multi-tenant architecture
+- Multi-tenant architecture"""
+
+@lru_cache(maxsize=1)
+def readme_prefix() -> str:
+    """README excerpt cached for the whole session so the prompt prefix stays
+    byte-identical across calls and Ollama can reuse its prefix KV cache"""
+    return read_file("README.md")[:3000]
+
+async def execute_task(task: str) -> bool:
+    """Execute a single task using the LLM"""
+    log(f"Executing: {task}")
+
+    relevant_files = select_relevant_files(task)
+    file_context = await build_file_context(relevant_files)
+
+    # Stable prefix (system prompt, blurb, README) first; variable parts last
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"""{PROJECT_BLURB}
 
 PROJECT README:
-{readme}
+{readme_prefix()}
 
 RELEVANT CODE:
-{file_context[:20000]}
+{file_context}
+
+TASK: {task}
 
 Execute this task. Provide specific code changes."""
         }
     ]
 
     log("Calling LLM...")
-    response = call_llm(messages)
-    log(f"Got response ({len(response)} chars)")
     print("\n" + "="*50)
-    print(response[:2000])  # Show first part of response
-    print("="*50 + "\n")
+    response = await call_llm_cached(response_cache_key(task, relevant_files), messages)
+    print("\n" + "="*50 + "\n")
+    log(f"Got response ({len(response)} chars)")
 
     # Parse and apply changes
     changes_made = apply_changes(response)
 
     return changes_made
 
+# Delimiter the model is asked to emit between per-task answers in a batch
+_TASK_HEADER_RE = re.compile(r'^###\s*TASK\s+(\d+)\s+RESPONSE\s*###\s*$', re.M)
+
+async def execute_task_batch(tasks: list) -> list:
+    """Execute several tasks in one LLM request, amortizing the shared prompt prefix.
+
+    Returns one bool (changes made) or Exception per task, in order.
+    """
+    if len(tasks) == 1:
+        try:
+            return [await execute_task(tasks[0])]
+        except Exception as e:
+            return [e]
+
+    for task in tasks:
+        log(f"Executing (batched): {task}")
+
+    # Union of relevant files across the batch, capped to keep the prompt bounded
+    relevant_files = []
+    for task in tasks:
+        for f in select_relevant_files(task):
+            if f not in relevant_files:
+                relevant_files.append(f)
+    file_context = await build_file_context(relevant_files, limit=8)
+
+    task_list = "\n".join(f"TASK {i + 1}: {task}" for i, task in enumerate(tasks))
+
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"""{PROJECT_BLURB}
+
+PROJECT README:
+{readme_prefix()}
+
+RELEVANT CODE:
+{file_context}
+
+TASKS:
+{task_list}
+
+Execute each task independently. Start each task's answer with a line
+### TASK <n> RESPONSE ###
+followed by that task's analysis and code changes."""
+        }
+    ]
+
+    log(f"Calling LLM with batch of {len(tasks)} tasks...")
+    print("\n" + "="*50)
+    response = await call_llm_cached(
+        response_cache_key("\n".join(tasks), relevant_files), messages
+    )
+    print("\n" + "="*50 + "\n")
+    log(f"Got response ({len(response)} chars)")
+
+    headers = list(_TASK_HEADER_RE.finditer(response))
+    if not headers:
+        # Model ignored the delimiters; apply the whole reply as one unit
+        log("No task delimiters in batch response, applying as a whole")
+        try:
+            changed = apply_changes(response)
+            return [changed for _ in tasks]
+        except Exception as e:
+            return [e for _ in tasks]
+
+    # Slice the response into per-task segments and apply each independently
+    segments = {}
+    for i, m in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(response)
+        try:
+            task_num = int(m.group(1))
+        except ValueError:
+            continue
+        segments[task_num] = response[m.end():end]
+
+    results = []
+    for i, task in enumerate(tasks):
+        segment = segments.get(i + 1)
+        if segment is None:
+            results.append(RuntimeError(f"No response segment for task: {task}"))
+            continue
+        try:
+            results.append(apply_changes(segment))
+        except Exception as e:
+            results.append(e)
+    return results
+
+# Matches FILE: markers and fence lines without materializing every line;
+# fallback parser for responses the fast scan can't anchor
+_MARKER_RE = re.compile(r'^(?:\s*FILE:\s*(?P<file>.+)|(?P<fence>```[^\n]*))$', re.M)
+
+def _at_line_start(response: str, pos: int) -> bool:
+    """True if only whitespace sits between pos and the start of its line"""
+    line_start = response.rfind("\n", 0, pos) + 1
+    return response[line_start:pos].strip() == ""
+
+def _find_anchor(response: str, needle: str, pos: int) -> int:
+    """Next occurrence of needle at the start of a line, or -1"""
+    while True:
+        i = response.find(needle, pos)
+        if i < 0 or _at_line_start(response, i):
+            return i
+        pos = i + len(needle)
+
 def apply_changes(response: str) -> bool:
-    """Parse LLM response and apply file changes"""
-    lines = response.split("\n")
-    current_file = None
-    current_content = []
-    in_code_block = False
-    changes_made = False
+    """Parse LLM response and apply file changes.
 
-    for line in lines:
-        if line.strip().startswith("FILE:"):
-            # Save previous file if any
-            if current_file and current_content:
-                if save_file_changes(current_file, "\n".join(current_content)):
+    Single forward pass jumping between FILE:/fence anchors with str.find,
+    so only the regions that matter are ever sliced; falls back to the
+    regex parser if the scan can't anchor anything the regex can.
+    """
+    changes_made = False
+    files_seen = 0
+
+    f = _find_anchor(response, "FILE:", 0)
+    while f >= 0:
+        nl = response.find("\n", f)
+        if nl < 0:
+            break
+        filepath = response[f + 5:nl].strip()
+        files_seen += 1
+
+        # This file's region runs to the next line-start FILE: marker
+        region_end = _find_anchor(response, "FILE:", nl + 1)
+        if region_end < 0:
+            region_end = len(response)
+
+        # Apply every fenced block in the region, later blocks winning,
+        # matching the original line-by-line parser
+        pos = nl
+        while pos < region_end:
+            open_fence = _find_anchor(response, "```", pos)
+            if open_fence < 0 or open_fence >= region_end:
+                break
+            body_start = response.find("\n", open_fence)
+            if body_start < 0:
+                break
+            body_start += 1
+
+            close_fence = response.find("\n```", body_start - 1)
+            if close_fence < 0 or close_fence >= region_end:
+                # Unterminated block: runs to the end of the region
+                content = response[body_start:region_end]
+                if content.endswith("\n"):
+                    content = content[:-1]
+                if filepath and content and save_file_changes(filepath, content):
                     changes_made = True
+                break
+
+            content = response[body_start:close_fence]
+            if filepath and content and save_file_changes(filepath, content):
+                changes_made = True
+            pos = response.find("\n", close_fence + 1)
+            if pos < 0:
+                break
+
+        if region_end >= len(response):
+            break
+        f = region_end
 
-            current_file = line.replace("FILE:", "").strip()
-            current_content = []
-            in_code_block = False
-        elif line.startswith("```"):
-            if in_code_block and current_file and current_content:
-                if save_file_changes(current_file, "\n".join(current_content)):
+    if files_seen == 0 and _MARKER_RE.search(response):
+        return _apply_changes_regex(response)
+    return changes_made
+
+def _apply_changes_regex(response: str) -> bool:
+    """Regex-driven parse used when the fast scan finds no usable anchors"""
+    changes_made = False
+    current_file = None
+    block_start = None  # offset just past the opening fence line, or None
+
+    def _save(end: int) -> bool:
+        content = response[block_start:end]
+        if content.endswith("\n"):
+            content = content[:-1]
+        return bool(content) and save_file_changes(current_file, content)
+
+    for m in _MARKER_RE.finditer(response):
+        if m.group('file') is not None:
+            # Save any block still open for the previous file
+            if current_file and block_start is not None:
+                if _save(m.start()):
                     changes_made = True
-                current_content = []
-            in_code_block = not in_code_block
-        elif in_code_block and current_file:
-            current_content.append(line)
-
-    # Handle last file
-    if current_file and current_content:
-        if save_file_changes(current_file, "\n".join(current_content)):
+            current_file = m.group('file').strip()
+            block_start = None
+        else:
+            if block_start is None:
+                block_start = m.end() + 1  # skip the newline after the fence
+            else:
+                if current_file and _save(m.start()):
+                    changes_made = True
+                block_start = None
+
+    # Handle an unterminated trailing block
+    if current_file and block_start is not None and block_start <= len(response):
+        if _save(len(response)):
             changes_made = True
 
     return changes_made
@@ -308,14 +821,17 @@ def save_file_changes(filepath: str, content: str) -> bool:
 
     try:
         full_path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not full_path.exists()
         full_path.write_text(content)
+        if is_new:
+            FILE_INDEX.mark_stale()
         log(f"Updated: {filepath}")
         return True
     except Exception as e:
         log(f"Error writing {filepath}: {e}")
         return False
 
-def run_analysis():
+async def run_analysis():
     """Analyze codebase and add new tasks"""
     log("Running codebase analysis to find new tasks...")
 
@@ -323,6 +839,8 @@ def run_analysis():
     files = get_file_list()[:10]
     file_summary = "\n".join(files)
 
+    contents = await read_files(["README.md", "backend/src/routes/auth.ts"])
+
     messages = [
         {
             "role": "system",
@@ -340,10 +858,10 @@ KEY FILES:
 {file_summary}
 
 README:
-{read_file('README.md')[:2000]}
+{contents['README.md'][:2000]}
 
 Sample code from auth route:
-{read_file('backend/src/routes/auth.ts')[:3000]}
+{contents['backend/src/routes/auth.ts'][:3000]}
 
 Output exactly in this format, one per line:
 - [ ] CATEGORY: Specific description of issue and file location
@@ -354,25 +872,25 @@ Be specific about file paths and what needs to change."""
         }
     ]
 
-    response = call_llm(messages)
+    response = await call_llm(messages, echo=False)
 
     # Add new tasks to TODO
-    content = TODO_FILE.read_text()
-    added = 0
-    for line in response.split("\n"):
-        line = line.strip()
-        if line.startswith("- [ ]"):
-            if line not in content:
-                content = content.replace("## Priority Queue\n", f"## Priority Queue\n{line}\n")
-                added += 1
-
-    if added > 0:
-        TODO_FILE.write_text(content)
-        log(f"Added {added} new tasks from analysis")
-    else:
-        log("No new tasks found in analysis")
+    async with TODO_LOCK:
+        added = 0
+        for line in response.split("\n"):
+            line = line.strip()
+            if line.startswith("- [ ]"):
+                if TODO_STORE.add_task(line):
+                    added += 1
+
+        if added > 0:
+            log(f"Added {added} new tasks from analysis")
+        else:
+            log("No new tasks found in analysis")
+
+async def main_async():
+    global CLIENT
 
-def main():
     print()
     log("=" * 50)
     log("FireLater Autonomous Development Agent")
@@ -384,49 +902,86 @@ def main():
     os.chdir(PROJECT_DIR)
     init_todo()
 
+    CLIENT = httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(600.0, connect=10.0),
+        limits=httpx.Limits(max_keepalive_connections=16, max_connections=32)
+    )
+    await prewarm_session()
+    pinger = asyncio.create_task(keepalive_pinger())
+
     iteration = 0
     consecutive_failures = 0
     max_failures = 3
 
-    while True:
-        iteration += 1
-        log(f"--- Iteration {iteration} ---")
-
-        task = get_next_task()
-
-        if not task:
-            log("No pending tasks. Running analysis...")
-            run_analysis()
-            time.sleep(10)
-            continue
-
-        try:
-            changes_made = execute_task(task)
-            mark_task_complete(task)
-            add_session_note(f"Completed: {task}")
-
-            if changes_made:
-                git_commit(f"Auto: {task[:50]}")
+    try:
+        while True:
+            iteration += 1
+            log(f"--- Iteration {iteration} ---")
+
+            async with TODO_LOCK:
+                tasks = TODO_STORE.get_next_tasks(BATCH)
+
+            if not tasks:
+                log("No pending tasks. Running analysis...")
+                await run_analysis()
+                async with TODO_LOCK:
+                    TODO_STORE.flush()
+                await asyncio.sleep(10)
+                continue
+
+            results = await execute_task_batch(tasks)
+
+            batch_failed = False
+            for task, result in zip(tasks, results):
+                if isinstance(result, Exception):
+                    log(f"Error executing task: {result}")
+                    async with TODO_LOCK:
+                        TODO_STORE.add_session_note(f"FAILED: {task} - {str(result)[:100]}")
+                    batch_failed = True
+                    continue
+
+                async with TODO_LOCK:
+                    TODO_STORE.mark_task_complete(task)
+                    TODO_STORE.add_session_note(f"Completed: {task}")
+
+                if result:
+                    queue_commit(f"Auto: {task[:50]}")
+
+                log(f"Task completed: {task}")
+
+            if batch_failed:
+                consecutive_failures += 1
+                if consecutive_failures >= max_failures:
+                    log(f"Too many consecutive failures ({max_failures}). Pausing...")
+                    await asyncio.sleep(60)
+                    consecutive_failures = 0
+            else:
+                consecutive_failures = 0
 
-            log(f"Task completed: {task}")
-            consecutive_failures = 0
+            async with TODO_LOCK:
+                TODO_STORE.flush()
 
-        except Exception as e:
-            log(f"Error executing task: {e}")
-            add_session_note(f"FAILED: {task} - {str(e)[:100]}")
-            consecutive_failures += 1
+            # Commit in batches, off the loop so git doesn't stall the next request
+            if len(PENDING_COMMITS) >= COMMIT_EVERY:
+                await asyncio.to_thread(flush_commits)
 
-            if consecutive_failures >= max_failures:
-                log(f"Too many consecutive failures ({max_failures}). Pausing...")
-                time.sleep(60)
-                consecutive_failures = 0
+            log("Pausing 15 seconds before next iteration...")
+            flush_log()
+            await asyncio.sleep(15)
+    finally:
+        pinger.cancel()
+        TODO_STORE.flush()
+        flush_commits()
+        await CLIENT.aclose()
 
-        log("Pausing 15 seconds before next iteration...")
-        time.sleep(15)
+def main():
+    asyncio.run(main_async())
 
 if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
         log("\nStopped by user")
+        flush_log()
         sys.exit(0)